@@ -60,7 +60,7 @@ cpdef int build_ratemat(const double[::1] theta, npy_intp n, double[:, ::1] out,
     cdef npy_intp u = 0, k = 0, i = 0, j = 0
     cdef npy_intp n_triu = n*(n-1)/2
     cdef double s_ij, K_ij, K_ji
-    cdef double[::1] pi
+    cdef double[::1] sqrt_pi
     cdef int buildS = strcmp(which, 'S') == 0
     if DEBUG:
         assert out.shape[0] == n
@@ -68,9 +68,11 @@ cpdef int build_ratemat(const double[::1] theta, npy_intp n, double[:, ::1] out,
         assert theta.shape[0] == n_triu + n
         assert np.all(np.asarray(out) == 0)
 
-    pi = zeros(n)
+    # sqrt(pi_i) = exp(theta_i / 2), so the square roots are folded into
+    # the exponentials once per state instead of taken once per pair.
+    sqrt_pi = zeros(n)
     for i in range(n):
-        pi[i] = exp(theta[n_triu+i])
+        sqrt_pi[i] = exp(0.5 * theta[n_triu+i])
 
     for u in range(n_triu):
         k_to_ij(u, n, &i, &j)
@@ -79,8 +81,8 @@ cpdef int build_ratemat(const double[::1] theta, npy_intp n, double[:, ::1] out,
         if DEBUG:
             assert 0 <= u < n*(n-1)/2
 
-        K_ij = s_ij * sqrt(pi[j] / pi[i])
-        K_ji = s_ij * sqrt(pi[i] / pi[j])
+        K_ij = s_ij * sqrt_pi[j] / sqrt_pi[i]
+        K_ji = s_ij * sqrt_pi[i] / sqrt_pi[j]
         if buildS:
            out[i, j] = s_ij
            out[j, i] = s_ij
@@ -309,8 +311,9 @@ cpdef int dK_dtheta_u(const double[::1] theta, npy_intp n, npy_intp i,
 
     return 0
 
-def loglikelihood(const double[::1] theta, const double[:, ::1] counts, double t=1):
-    r"""loglikelihood(theta, counts, n, t=1)
+def loglikelihood(const double[::1] theta, const double[:, ::1] counts, double t=1,
+                  double[::1] out=None):
+    r"""loglikelihood(theta, counts, n, t=1, out=None)
 
     Log likelihood and gradient of the log likelihood of a continuous-time
     Markov model.
@@ -326,6 +329,9 @@ def loglikelihood(const double[::1] theta, const double[:, ::1] counts, double t
         The matrix of observed transition counts.
     t : double
         The lag time.
+    out : array of shape = (n*(n-1)/2 + n), optional
+        If not None, the gradient is written into this array (which is also
+        returned) instead of a newly allocated one.
 
     Returns
     -------
@@ -347,7 +353,12 @@ def loglikelihood(const double[::1] theta, const double[:, ::1] counts, double t
     cdef double[::1] grad, w, pi
     cdef double[:, ::1] K, T, dT, U, V
 
-    grad = zeros(size)
+    if out is None:
+        grad = zeros(size)
+    elif out.shape[0] != size:
+        raise ValueError('out must have the same shape as theta')
+    else:
+        grad = out
     S = zeros((n, n))
     T = zeros((n, n))
     dT = zeros((n, n))
@@ -356,7 +367,8 @@ def loglikelihood(const double[::1] theta, const double[:, ::1] counts, double t
     if not np.all(np.isfinite(S)):
         # these parameters don't seem good...
         # tell the optimizer to stear clear!
-        return np.nan, ascontiguousarray(grad)
+        memset(&grad[0], 0, size*sizeof(double))
+        return np.nan, np.asarray(grad)
 
     pi = zeros(n)
     for i in range(n):
@@ -374,7 +386,7 @@ def loglikelihood(const double[::1] theta, const double[:, ::1] counts, double t
                 if counts[i, j] > 0:
                     logl += counts[i, j] * log(T[i, j])
 
-    return logl, ascontiguousarray(grad)
+    return logl, np.asarray(grad)
 
 
 def hessian(double[::1] theta, double[:, ::1] counts, double t=1, npy_intp[::1] inds=None):
@@ -616,8 +628,8 @@ def sigma_pi(const double[:, :] covar_theta, const double[::1] theta, npy_intp n
 
 
 def sigma_eigenvalues(const double[:, ::1] covar_theta, const double[::1] theta,
-                     npy_intp n):
-    r"""sigma_eigenvalues(covar_theta, theta, n)
+                     npy_intp n, eigensystem=None):
+    r"""sigma_eigenvalues(covar_theta, theta, n, eigensystem=None)
 
     Estimate the asymptotic standard deviation (uncertainty) in the
     eigenvalues of K
@@ -633,6 +645,10 @@ def sigma_eigenvalues(const double[:, ::1] covar_theta, const double[::1] theta,
         rate matrix, S, followed by the log of the equilibrium distribution.
     n : int
         The size of `counts`
+    eigensystem : tuple of arrays (w, U, V), optional
+        The eigenvalues and left and right eigenvectors of K at `theta`, as
+        returned by ``eig_K``. If supplied, these are used instead of
+        diagonalizing the rate matrix again.
 
     Returns
     -------
@@ -652,19 +668,21 @@ def sigma_eigenvalues(const double[:, ::1] covar_theta, const double[::1] theta,
     if not covar_theta.shape[0] == size and covar_theta.shape[1] == size:
         raise ValueError('covar_theta must be `size` x `size`')
 
-    pi = zeros(n)
-    S = zeros((n, n))
     dKu = zeros((n, n))
     temp1 = zeros(n)
     temp2 = zeros(size)
     sigma_w = zeros(n)
     dlambda_dtheta = np.zeros((n, size), order='F')
 
-    for i in range(n):
-        pi[i] = exp(theta[n_triu+i])
-
-    build_ratemat(theta, n, S, 'S')
-    w, U, V = eig_K(S, n, pi, 'S')
+    if eigensystem is None:
+        pi = zeros(n)
+        S = zeros((n, n))
+        for i in range(n):
+            pi[i] = exp(theta[n_triu+i])
+        build_ratemat(theta, n, S, 'S')
+        w, U, V = eig_K(S, n, pi, 'S')
+    else:
+        w, U, V = eigensystem
 
     order = np.argsort(w)[::-1]
 
@@ -685,8 +703,8 @@ def sigma_eigenvalues(const double[:, ::1] covar_theta, const double[::1] theta,
 
 
 def sigma_timescales(const double[:, ::1] covar_theta, const double[::1] theta,
-                     npy_intp n):
-    r"""sigma_timescales(covar_theta, theta, n):
+                     npy_intp n, eigensystem=None):
+    r"""sigma_timescales(covar_theta, theta, n, eigensystem=None):
 
     Estimate the asymptotic standard deviation (uncertainty) in the
     implied timescales.
@@ -702,6 +720,10 @@ def sigma_timescales(const double[:, ::1] covar_theta, const double[::1] theta,
         rate matrix, S, followed by the log of the equilibrium distribution.
     n : int
         The size of `counts`
+    eigensystem : tuple of arrays (w, U, V), optional
+        The eigenvalues and left and right eigenvectors of K at `theta`, as
+        returned by ``eig_K``. If supplied, these are used instead of
+        diagonalizing the rate matrix again.
 
     Returns
     -------
@@ -721,8 +743,6 @@ def sigma_timescales(const double[:, ::1] covar_theta, const double[::1] theta,
     if not covar_theta.shape[0] == size and covar_theta.shape[1] == size:
         raise ValueError('covar_theta must be `size` x `size`')
 
-    pi = zeros(n)
-    S = zeros((n, n))
     dKu = zeros((n, n))
     temp1 = zeros(n)
     temp2 = zeros(size)
@@ -730,11 +750,15 @@ def sigma_timescales(const double[:, ::1] covar_theta, const double[::1] theta,
     dlambda_dtheta = np.zeros((n, size), order='F')
     dtau_dtheta = np.zeros((n, size))
 
-    for i in range(n):
-        pi[i] = exp(theta[n_triu+i])
-
-    build_ratemat(theta, n, S, 'S')
-    w, U, V = eig_K(S, n, pi, 'S')
+    if eigensystem is None:
+        pi = zeros(n)
+        S = zeros((n, n))
+        for i in range(n):
+            pi[i] = exp(theta[n_triu+i])
+        build_ratemat(theta, n, S, 'S')
+        w, U, V = eig_K(S, n, pi, 'S')
+    else:
+        w, U, V = eigensystem
 
     order = np.argsort(w)[::-1]
     U = ascontiguousarray(np.asarray(U)[:, order])
@@ -18,8 +18,8 @@ from ..utils import list_of_1d
 
 __all__ = [
     '_MappingTransformMixin', '_dict_compose', '_strongly_connected_subgraph',
-    '_transition_counts', '_solve_ratemat_eigensystem',
-    '_normalize_eigensystem',
+    '_transition_counts', '_solve_ratemat_eigensystem', '_eig_ratemat',
+    '_normalize_eigensystem', '_dominant_order',
     '_solve_msm_eigensystem',
 ]
 
@@ -344,18 +344,59 @@ def _solve_ratemat_eigensystem(theta, k, n):
     """
     S = np.zeros((n, n))
     pi = np.exp(theta[-n:])
-    pi = pi / pi.sum()
+    pi /= pi.sum()
 
     _ratematrix.build_ratemat(theta, n, S, which='S')
-    u, lv, rv = map(np.asarray, _ratematrix.eig_K(S, n, pi, 'S'))
-    order = np.argsort(-u)
-    u = u[order[:k]]
-    lv = lv[:, order[:k]]
-    rv = rv[:, order[:k]]
+    u, lv, rv = _eig_ratemat(S, pi)
+    order = _dominant_order(u, k)
+    u = u[order]
+    lv = lv[:, order]
+    rv = rv[:, order]
 
     return _normalize_eigensystem(u, lv, rv)
 
 
+def _eig_ratemat(S, pi):
+    """Diagonalize a reversible rate matrix from its symmetric form, S
+
+    If the nonzero pattern of S splits the states into several disconnected
+    blocks, each block is diagonalized on its own, which reduces the cost
+    from O(n^3) to the sum of the cubes of the block sizes.
+
+    Parameters
+    ----------
+    S : np.ndarray, shape=(n, n)
+        The symmetric rate matrix, as built by
+        ``_ratematrix.build_ratemat(..., which='S')``
+    pi : np.ndarray, shape=(n,)
+        The stationary distribution
+
+    Returns
+    -------
+    w : np.ndarray, shape=(n,)
+        The eigenvalues of K
+    U : np.ndarray, shape=(n, n)
+        The left eigenvectors of K
+    V : np.ndarray, shape=(n, n)
+        The right eigenvectors of K
+    """
+    n = S.shape[0]
+    n_components, labels = csgraph.connected_components(
+        csr_matrix(S), directed=False)
+    if n_components == 1:
+        return tuple(map(np.asarray, _ratematrix.eig_K(S, n, pi, 'S')))
+
+    w = np.zeros(n)
+    U = np.zeros((n, n))
+    V = np.zeros((n, n))
+    for component in range(n_components):
+        indices = np.where(labels == component)[0]
+        block = np.ix_(indices, indices)
+        w[indices], U[block], V[block] = _ratematrix.eig_K(
+            np.ascontiguousarray(S[block]), len(indices), pi[indices], 'S')
+    return w, U, V
+
+
 def _solve_msm_eigensystem(transmat, k):
     """Find the dominant eigenpairs of an MSM transition matrix
 
@@ -395,6 +436,18 @@ def _solve_msm_eigensystem(transmat, k):
     return _normalize_eigensystem(u, lv, rv)
 
 
+def _dominant_order(u, k):
+    """Indices of the `k` largest elements of `u`, in descending order
+
+    Only a handful of eigenvalues are usually needed, so partition first and
+    sort just those, rather than sorting the whole spectrum.
+    """
+    if k >= len(u):
+        return np.argsort(-u)
+    top = np.argpartition(-u, k)[:k]
+    return top[np.argsort(-u[top])]
+
+
 def _normalize_eigensystem(u, lv, rv):
     """Normalize the eigenvectors of a reversible Markov state model according
     to our preferred scheme.
@@ -561,8 +614,10 @@ def _transition_counts(sequences, lag_time=1, sliding_window=True):
     none_to_nan = np.vectorize(lambda x: np.nan if x is None else x,
                                otypes=[np.float])
 
-    counts = np.zeros((n_states, n_states), dtype=float)
-    _transitions = []
+    # gather the (from, to) pairs of every sequence and aggregate them into
+    # the count matrix with a single sparse COO -> dense conversion
+    _from_states = [np.zeros(0, dtype=int)]
+    _to_states = [np.zeros(0, dtype=int)]
 
     for y in sequences:
         y = np.asarray(y)
@@ -579,17 +634,21 @@ def _transition_counts(sequences, lag_time=1, sliding_window=True):
             from_states = from_states[mask]
             to_states = to_states[mask]
 
-        if (not mapping_is_identity) and len(from_states) > 0 and len(
-                to_states) > 0:
+        if len(from_states) == 0 or len(to_states) == 0:
+            continue
+
+        if not mapping_is_identity:
             from_states = mapping_fn(from_states)
             to_states = mapping_fn(to_states)
 
-        _transitions.append(np.row_stack((from_states, to_states)))
+        _from_states.append(from_states)
+        _to_states.append(to_states)
 
-    transitions = np.hstack(_transitions)
-    C = coo_matrix((np.ones(transitions.shape[1], dtype=int), transitions),
+    from_states = np.concatenate(_from_states)
+    to_states = np.concatenate(_to_states)
+    C = coo_matrix((np.ones(len(from_states)), (from_states, to_states)),
                    shape=(n_states, n_states))
-    counts = counts + np.asarray(C.todense())
+    counts = C.toarray()
 
     # If sliding window is False, this function will be called recursively
     # with strided trajectories and lag_time = 1, which gives the desired
@@ -5,6 +5,9 @@
 
 from __future__ import print_function, division
 
+from functools import lru_cache
+from math import isfinite
+
 import numpy as np
 import scipy.linalg
 import scipy.optimize
@@ -13,11 +16,26 @@ from six.moves import cStringIO
 from . import _ratematrix
 from ._markovstatemodel import _transmat_mle_prinz
 from .core import (_MappingTransformMixin, _CountsMSMMixin, _dict_compose,
-                   _solve_ratemat_eigensystem, _SampleMSMMixin)
+                   _solve_ratemat_eigensystem, _normalize_eigensystem,
+                   _eig_ratemat, _dominant_order, _SampleMSMMixin)
 from ..base import BaseEstimator
 from ..utils import printoptions
 
 
+@lru_cache(maxsize=1)
+def _triu_indices(n):
+    """Cached, read-only ``np.triu_indices(n, k=1)``
+
+    Only the most recent ``n`` is kept, so repeated fits with the same
+    number of states reuse the indices without pinning arrays for every
+    size seen.
+    """
+    i, j = np.triu_indices(n, k=1)
+    i.setflags(write=False)
+    j.setflags(write=False)
+    return i, j
+
+
 class ContinuousTimeMSM(BaseEstimator, _MappingTransformMixin,
                         _CountsMSMMixin, _SampleMSMMixin):
     """Reversible first order master equation model
@@ -90,6 +108,8 @@ class ContinuousTimeMSM(BaseEstimator, _MappingTransformMixin,
     information_ : np.ndarray, shape=(len(theta_), len(theta_))
         Approximate inverse of the hessian of the model log-likelihood
         evaluated at ``theta_``.
+    loglikelihoods_ : np.ndarray, shape=(n_evaluations,)
+        Log-likelihood at each objective evaluation made by the optimizer.
     eigenvalues_ :  array of shape=(n_timescales+1)
         Largest eigenvalues of the rate matrix.
     left_eigenvectors_ : array of shape=(n_timescales+1)
@@ -125,6 +145,7 @@ class ContinuousTimeMSM(BaseEstimator, _MappingTransformMixin,
         self.mapping_ = None
         self.populations_ = None
         self.information_ = None
+        self._eig_cache_ = None
         self.loglikelihoods_ = None
         self.timescales_ = None
         self.eigenvalues_ = None
@@ -137,6 +158,14 @@ class ContinuousTimeMSM(BaseEstimator, _MappingTransformMixin,
         return {k: v for k, v in self.__dict__.items()
                 if k != 'optimizer_state_'}
 
+    def __setstate__(self, state):
+        # models pickled before transmat_ became a property store the
+        # matrix directly under that name
+        if 'transmat_' in state:
+            state = dict(state)
+            state['_transmat'] = state.pop('transmat_')
+        self.__dict__.update(state)
+
 
     def fit(self, sequences, y=None):
         self._build_counts(sequences)
@@ -144,29 +173,95 @@ class ContinuousTimeMSM(BaseEstimator, _MappingTransformMixin,
 
     def _fit(self):
         result, loglikelihoods = self._optimize()
+        n = self.n_states_
 
-        K = np.zeros((self.n_states_, self.n_states_))
-        _ratematrix.build_ratemat(result.x, self.n_states_, K, which='K')
+        K = np.zeros((n, n))
+        S = np.zeros((n, n))
+        _ratematrix.build_ratemat(result.x, n, K, which='K')
+        _ratematrix.build_ratemat(result.x, n, S, which='S')
+        pi = np.exp(result.x[-n:])
+        pi /= pi.sum()
+
+        # K is similar to the symmetric matrix S, so a single symmetric
+        # eigendecomposition gives us both expm(K) and the eigensystem,
+        # instead of a separate Pade expm and eigensolve. transmat_ is
+        # only assembled from it on first access.
+        w, U, V = _eig_ratemat(S, pi)
 
         self.theta_ = result.x
         self.ratemat_ = K
-        self.transmat_ = scipy.linalg.expm(self.ratemat_)
+        self._transmat = None
         self.optimizer_state_ = result
-        pi = np.exp(result.x[-self.n_states_:])
-        self.populations_ = pi / pi.sum()
+        self.populations_ = pi
         self.information_ = None
-        self.loglikelihoods_ = loglikelihoods
+        self._eig_cache_ = (w, U, V)
+        self.loglikelihoods_ = np.array(loglikelihoods)
 
         n_timescales = self.n_timescales
         if n_timescales is None:
-            n_timescales = self.n_states_ - 1
-        k = n_timescales + 1
+            n_timescales = n - 1
+        order = _dominant_order(w, n_timescales + 1)
         self.eigenvalues_, self.left_eigenvectors_, self.right_eigenvectors_ = \
-            _solve_ratemat_eigensystem(self.theta_, k, self.n_states_)
-        self.timescales_ = -1 / self.eigenvalues_[1:]
+            _normalize_eigensystem(w[order], U[:, order], V[:, order])
+        # disconnected blocks each contribute an exact zero eigenvalue,
+        # whose timescale is infinite
+        u = self.eigenvalues_[1:]
+        with np.errstate(divide='ignore'):
+            self.timescales_ = np.where(u < 0, -1 / u, np.inf)
 
         return self
 
+    @property
+    def transmat_(self):
+        """The estimated state-to-state transition probabilities over an
+        interval of 1 time unit, ``expm(ratemat_)``.
+
+        The matrix may also be assigned, in which case the assigned value is
+        returned here and used by ``apply_transmat``.
+        """
+        eig_cache = getattr(self, '_eig_cache_', None)
+        if getattr(self, '_transmat', None) is None and eig_cache is not None:
+            w, U, V = eig_cache
+            # expm(K) is elementwise non-negative, but rounding in the
+            # eigenvector products can leave entries at about -1e-16 where
+            # the true probability is ~0. Clip them so that sample() and
+            # the tpt code always see valid probabilities.
+            self._transmat = np.maximum(np.dot(V * np.exp(w), U.T), 0)
+        return getattr(self, '_transmat', None)
+
+    @transmat_.setter
+    def transmat_(self, value):
+        """Override the transition matrix."""
+        self._transmat = value
+
+    def apply_transmat(self, v):
+        """Multiply the transition matrix by a vector (or matrix),
+        ``np.dot(transmat_, v)``, without forming ``transmat_``
+
+        If ``transmat_`` has not been materialized (or assigned), this uses
+        the eigendecomposition of the rate matrix computed during ``fit()``.
+        Either way it costs O(n_states_^2) per column of `v`.
+
+        Parameters
+        ----------
+        v : array_like, shape=(n_states_,) or (n_states_, n_columns)
+            The vector(s) to propagate.
+
+        Returns
+        -------
+        Tv : np.ndarray, same shape as `v`
+            The product of ``transmat_`` with `v`.
+        """
+        transmat = getattr(self, '_transmat', None)
+        if transmat is not None:
+            return np.dot(transmat, v)
+
+        eig_cache = getattr(self, '_eig_cache_', None)
+        if eig_cache is None:
+            raise RuntimeError('The model must be fit() before use.')
+        w, U, V = eig_cache
+        return np.dot(V * np.exp(w), np.dot(U.T, v))
+
     def summarize(self):
         out = cStringIO()
         with printoptions(precision=4):
@@ -195,16 +290,29 @@ class ContinuousTimeMSM(BaseEstimator, _MappingTransformMixin,
             'eps': 1e-12,
             'ftol': 1e-12,
             'gtol': 1e-10,
+            # L-BFGS-B history size. Each objective evaluation costs an
+            # O(n^3) eigendecomposition, far more than the O(maxcor * p)
+            # two-loop update, and shorter histories (e.g. 5) need roughly
+            # twice as many evaluations to converge here.
+            'maxcor': 10,
         }
 
+        # the objective is evaluated thousands of times by L-BFGS-B, so
+        # keep the per-call Python overhead down
+        loglikelihood = _ratematrix.loglikelihood
+        # gradient buffer reused across calls. L-BFGS-B copies what it
+        # needs from the returned gradient before requesting the next one.
+        grad = np.empty_like(theta0)
+
         def objective(theta):
-            f, g = _ratematrix.loglikelihood(theta, countsmat, lag_time)
+            f, g = loglikelihood(theta, countsmat, lag_time, out=grad)
 
-            if not np.isfinite(f):
+            if not isfinite(f):
                 f = np.nan
 
             loglikelihoods.append(f)
-            return -f, -g
+            np.negative(g, out=g)
+            return -f, g
 
         # this bound prevents the stationary probability for any state
         # from going below exp(-20), which helps avoid NaNs, since the
@@ -212,6 +320,12 @@ class ContinuousTimeMSM(BaseEstimator, _MappingTransformMixin,
         # numerically as the populations go too close to zero. We also
         # prevent the S_ijs from being less than 0.
         bounds = [(0, None)]*nc2 + [(-20, None)]*n
+
+        # L-BFGS-B is used even though an analytic hessian is available:
+        # each call to _ratematrix.hessian costs O(len(theta)) dense n x n
+        # eigen-products, which is far more than the handful of extra
+        # gradient evaluations a second-order method like trust-constr
+        # would save.
         result = scipy.optimize.minimize(
             fun=objective, x0=theta0, method='L-BFGS-B', jac=True,
             bounds=bounds, options=options)
@@ -248,7 +362,8 @@ class ContinuousTimeMSM(BaseEstimator, _MappingTransformMixin,
             self._build_information()
 
         sigma_eigenvalues = _ratematrix.sigma_eigenvalues(
-            self.information_, theta=self.theta_, n=self.n_states_)
+            self.information_, theta=self.theta_, n=self.n_states_,
+            eigensystem=getattr(self, '_eig_cache_', None))
 
         if self.n_timescales is None:
             return sigma_eigenvalues
@@ -262,7 +377,8 @@ class ContinuousTimeMSM(BaseEstimator, _MappingTransformMixin,
             self._build_information()
 
         sigma_timescales = _ratematrix.sigma_timescales(
-            self.information_, theta=self.theta_, n=self.n_states_)
+            self.information_, theta=self.theta_, n=self.n_states_,
+            eigensystem=getattr(self, '_eig_cache_', None))
 
         if self.n_timescales is None:
             return sigma_timescales
@@ -277,7 +393,20 @@ class ContinuousTimeMSM(BaseEstimator, _MappingTransformMixin,
 
         if self.guess == 'log':
             transmat, pi = _transmat_mle_prinz(countsmat)
-            K = np.real(scipy.linalg.logm(transmat)) / self.lag_time
+            # transmat satisfies detailed balance with respect to pi, so it
+            # is similar to a symmetric matrix and its matrix log can be
+            # taken with a symmetric eigendecomposition. Taking log(|w|)
+            # matches the real part of the principal logarithm. The diagonal
+            # similarity transforms are applied by in-place broadcasting
+            # rather than by building n x n outer products.
+            sqrt_pi = np.sqrt(pi)
+            S_T = transmat * sqrt_pi[:, np.newaxis]
+            S_T /= sqrt_pi
+            w, U = scipy.linalg.eigh(S_T)
+            logw = np.log(np.maximum(np.abs(w), 1e-300))
+            K = np.dot(U * logw, U.T)
+            K /= sqrt_pi[:, np.newaxis] * self.lag_time
+            K *= sqrt_pi
 
         elif self.guess == 'pseudo':
             transmat, pi = _transmat_mle_prinz(countsmat)
@@ -287,8 +416,9 @@ class ContinuousTimeMSM(BaseEstimator, _MappingTransformMixin,
             pi = _solve_ratemat_eigensystem(self.guess)[1][:, 0]
             K = self.guess
 
-        S = np.multiply(np.sqrt(np.outer(pi, 1/pi)), K)
-        sflat = np.maximum(S[np.triu_indices_from(countsmat, k=1)], 0)
+        # only the upper triangle of S = sqrt(pi_i / pi_j) * K_ij is needed
+        i, j = _triu_indices(countsmat.shape[0])
+        sflat = np.maximum(np.sqrt(pi[i] * (1 / pi)[j]) * K[i, j], 0)
         theta0 = np.concatenate((sflat, np.log(pi)))
         return theta0
 
@@ -304,8 +434,10 @@ class ContinuousTimeMSM(BaseEstimator, _MappingTransformMixin,
         hessian = _ratematrix.hessian(
             self.theta_, self.countsmat_, t=lag_time, inds=inds)
 
+        # the hessian is symmetric, so its pseudo-inverse can be taken with
+        # a symmetric eigendecomposition instead of a full SVD
         self.information_ = np.zeros((len(self.theta_), len(self.theta_)))
-        self.information_[np.ix_(inds, inds)] = scipy.linalg.pinv(-hessian)
+        self.information_[np.ix_(inds, inds)] = scipy.linalg.pinvh(-hessian)
 
     @property
     def score_(self):
@@ -349,10 +481,10 @@ class ContinuousTimeMSM(BaseEstimator, _MappingTransformMixin,
             V = self._map_eigenvectors(V, m2.mapping_)
 
         S = np.diag(m2.populations_)
-        C = S.dot(m2.transmat_)
+        C_V = S.dot(m2.apply_transmat(V))
 
         try:
-            trace = np.trace(V.T.dot(C.dot(V)).dot(np.linalg.inv(V.T.dot(S.dot(V)))))
+            trace = np.trace(V.T.dot(C_V).dot(np.linalg.inv(V.T.dot(S.dot(V)))))
         except np.linalg.LinAlgError:
             trace = np.nan
 
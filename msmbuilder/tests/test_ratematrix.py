@@ -13,6 +13,7 @@ except ImportError:
 
 from msmbuilder.msm import _ratematrix
 from msmbuilder.msm import ContinuousTimeMSM, MarkovStateModel
+from msmbuilder.msm.core import _eig_ratemat, _dominant_order
 from msmbuilder.example_datasets import MullerPotential, DoubleWell
 from msmbuilder.example_datasets.muller import MULLER_PARAMETERS as PARAMS
 from msmbuilder.cluster import NDGrid
@@ -175,6 +176,21 @@ def test_grad_logl_1():
     assert check_grad(func, grad, theta0) < 1e-4
 
 
+def test_logl_out():
+    # the gradient written into `out` matches the freshly allocated one
+    n = 4
+    C = random.randint(10, size=(n, n)).astype(float)
+    theta = example_theta(n)
+
+    f1, g1 = _ratematrix.loglikelihood(theta, C)
+    out = np.empty_like(theta)
+    f2, g2 = _ratematrix.loglikelihood(theta, C, out=out)
+
+    assert f1 == f2
+    np.testing.assert_array_equal(g1, out)
+    assert np.shares_memory(g2, out)
+
+
 def test_dw_1():
     # test the gradient of the eigenvalues of K
     n = 5
@@ -346,6 +362,20 @@ def test_fit_2():
     assert abs(t1[-1] - t3[-1]) / t1[-1] < 0.50
 
 
+def test_transmat_expm():
+    # transmat_ is built from the eigendecomposition of K, rather than with
+    # scipy.linalg.expm, but must agree with it
+    grid = NDGrid(n_bins_per_feature=10, min=-np.pi, max=np.pi)
+    trajs = DoubleWell(random_state=0).get_cached().trajectories
+    seqs = grid.fit_transform(trajs)
+    model = ContinuousTimeMSM(verbose=False, lag_time=10).fit(seqs)
+
+    np.testing.assert_array_almost_equal(
+        model.transmat_, scipy.linalg.expm(model.ratemat_))
+    assert np.all(model.transmat_ >= 0)
+    np.testing.assert_array_almost_equal(model.transmat_.sum(axis=1), 1)
+
+
 def test_score_1():
     grid = NDGrid(n_bins_per_feature=5, min=-np.pi, max=np.pi)
     trajs = DoubleWell(random_state=0).get_cached().trajectories
@@ -388,6 +418,81 @@ def test_uncertainties_backward():
          [0., 0., 0.024098, -0.024098]])
 
 
+def test_uncertainties_eigensystem():
+    # passing the cached eigensystem from fit() should not change the
+    # uncertainty estimates
+    sequence = [0, 0, 0, 1, 1, 1, 0, 0, 2, 2, 0, 1, 1, 1, 2, 2, 2, 2, 2]
+    model = ContinuousTimeMSM(verbose=False).fit([sequence])
+    model._build_information()
+    n = model.n_states_
+
+    np.testing.assert_array_almost_equal(
+        _ratematrix.sigma_timescales(model.information_, model.theta_, n),
+        model.uncertainty_timescales())
+    np.testing.assert_array_almost_equal(
+        _ratematrix.sigma_eigenvalues(model.information_, model.theta_, n),
+        model.uncertainty_eigenvalues())
+
+
+def test_uncertainties_without_eig_cache():
+    # models pickled before the eigensystem was cached have no _eig_cache_
+    sequence = [0, 0, 0, 1, 1, 1, 0, 0, 2, 2, 0, 1, 1, 1, 2, 2, 2, 2, 2]
+    model = ContinuousTimeMSM(verbose=False).fit([sequence])
+    sigma_ts = model.uncertainty_timescales()
+    sigma_lambda = model.uncertainty_eigenvalues()
+    del model.__dict__['_eig_cache_']
+
+    np.testing.assert_array_almost_equal(
+        model.uncertainty_timescales(), sigma_ts)
+    np.testing.assert_array_almost_equal(
+        model.uncertainty_eigenvalues(), sigma_lambda)
+
+
+def test_eig_ratemat_blocks():
+    # a rate matrix with disconnected blocks is diagonalized block by block,
+    # and the transition matrix still matches expm(K)
+    n = 6
+    theta = example_theta(n)
+    for i in range(3):
+        for j in range(3, n):
+            theta[n * i - i * (i + 1) // 2 + j - i - 1] = 0
+    K = np.zeros((n, n))
+    S = np.zeros((n, n))
+    _ratematrix.build_ratemat(theta, n, K, which='K')
+    _ratematrix.build_ratemat(theta, n, S, which='S')
+    pi = np.exp(theta[-n:])
+
+    w, U, V = _eig_ratemat(S, pi)
+    np.testing.assert_array_almost_equal(
+        np.dot(V * np.exp(w), U.T), scipy.linalg.expm(K))
+    np.testing.assert_array_almost_equal(
+        np.sort(w), np.sort(np.real(scipy.linalg.eigvals(K))))
+
+    # fully diagonal (all rates zero)
+    theta[:n * (n - 1) // 2] = 0
+    S = np.zeros((n, n))
+    _ratematrix.build_ratemat(theta, n, S, which='S')
+    w, U, V = _eig_ratemat(S, pi)
+    np.testing.assert_array_almost_equal(np.dot(V * np.exp(w), U.T), np.eye(n))
+
+
+def test_fit_disconnected():
+    # two disconnected components: the second eigenvalue is exactly zero,
+    # so its timescale must be +inf rather than -inf
+    sequences = [[0, 1, 0, 1, 0, 0, 1], [2, 3, 2, 3, 3, 2]]
+    model = ContinuousTimeMSM(ergodic_cutoff=0).fit(sequences)
+    assert model.n_states_ == 4
+    assert np.isposinf(model.timescales_[0])
+    assert np.all(model.timescales_ > 0)
+
+
+def test_dominant_order():
+    w = random.randn(30)
+    for k in [1, 5, 29, 30, 40]:
+        np.testing.assert_array_equal(
+            _dominant_order(w, k), np.argsort(-w)[:k])
+
+
 def test_score_2():
     ds = MullerPotential(random_state=0).get_cached().trajectories
     cluster = NDGrid(n_bins_per_feature=6,
@@ -459,6 +564,47 @@ def test_doublewell():
             assert model.optimizer_state_.success
 
 
+def test_apply_transmat():
+    sequence = [0, 0, 0, 1, 1, 1, 0, 0, 2, 2, 0, 1, 1, 1, 2, 2, 2, 2, 2]
+    model = ContinuousTimeMSM(verbose=False).fit([sequence])
+    v = random.randn(3)
+    M = random.randn(3, 2)
+
+    np.testing.assert_array_almost_equal(
+        model.apply_transmat(v), model.transmat_.dot(v))
+    np.testing.assert_array_almost_equal(
+        model.apply_transmat(M), model.transmat_.dot(M))
+
+
+def test_apply_transmat_assigned():
+    sequence = [0, 0, 0, 1, 1, 1, 0, 0, 2, 2, 0, 1, 1, 1, 2, 2, 2, 2, 2]
+    model = ContinuousTimeMSM(verbose=False)
+    np.testing.assert_raises(RuntimeError, model.apply_transmat, np.ones(3))
+
+    model.fit([sequence])
+    model.transmat_ = np.eye(3)
+    v = random.randn(3)
+    np.testing.assert_array_almost_equal(model.apply_transmat(v), v)
+
+
+def test_load_legacy_pickle():
+    # models pickled before transmat_ became a lazy property store it in
+    # __dict__ and have no cached eigensystem
+    sequence = [0, 0, 0, 1, 1, 1, 0, 0, 2, 2, 0, 1, 1, 1, 2, 2, 2, 2, 2]
+    model = ContinuousTimeMSM(verbose=False).fit([sequence])
+    transmat = model.transmat_
+    state = model.__getstate__()
+    del state['_transmat'], state['_eig_cache_']
+    state['transmat_'] = transmat
+
+    m2 = ContinuousTimeMSM.__new__(ContinuousTimeMSM)
+    m2.__setstate__(state)
+    np.testing.assert_array_almost_equal(m2.transmat_, transmat)
+    np.testing.assert_array_almost_equal(
+        m2.apply_transmat(np.ones(3)), transmat.dot(np.ones(3)))
+    m2.uncertainty_timescales()
+
+
 def test_dump():
     # gh-713
     sequence = [0, 0, 0, 1, 1, 1, 0, 0, 2, 2, 0, 1, 1, 1, 2, 2, 2, 2, 2]